@@ -6,39 +6,307 @@ Only uploads if the file doesn't already exist.
 """
 
 import os
+import fnmatch
+import functools
+import io
+import mimetypes
 import pickle
 import hashlib
+import random
+import mmap
 import time
 import signal
+import shelve
 import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from datetime import datetime
 from pathlib import Path
 from google.auth.transport.requests import Request
+from google_auth_httplib2 import AuthorizedHttp
 from google.oauth2.credentials import Credentials
 from google_auth_oauthlib.flow import InstalledAppFlow
 from googleapiclient.discovery import build
-from googleapiclient.http import MediaFileUpload
+from googleapiclient.http import MediaIoBaseUpload, build_http
 from googleapiclient.errors import HttpError
 
+# Optional: BLAKE3 makes local fingerprinting much faster on multi-core machines
+try:
+    import blake3
+except ImportError:
+    blake3 = None
+
 # Scopes required for Drive access
 SCOPES = ['https://www.googleapis.com/auth/drive.file']
 
+# Read size used when hashing local files (1 MiB)
+HASH_CHUNK_SIZE = 1 << 20
+
+# Files larger than this are memory-mapped for hashing instead of read
+MMAP_THRESHOLD = 1 << 20
+
+# Truncating a file while it is mapped kills the process with SIGBUS, which
+# cannot be caught, so only files unmodified for this long are mapped (seconds)
+MMAP_SETTLE_TIME = 60
+
+# Without BLAKE3, larger files are fingerprinted in parallel segments of this size (64 MiB)
+FINGERPRINT_SEGMENT_SIZE = 64 * 1024 * 1024
+
+# Files up to this size are sent in a single multipart request (5 MiB)
+RESUMABLE_THRESHOLD = 5 * 1024 * 1024
+
+# Chunk size for resumable uploads of larger files (8 MiB)
+UPLOAD_CHUNK_SIZE = 8 * 1024 * 1024
+
+# Drive allows roughly 10 write requests per second per user; stay a little below
+DEFAULT_REQUESTS_PER_SECOND = 8
+
+# Maximum number of calls Drive accepts in a single batch request
+BATCH_SIZE = 100
+
+# Largest page size accepted by files().list
+LIST_PAGE_SIZE = 1000
+
+FOLDER_MIME_TYPE = 'application/vnd.google-apps.folder'
+
 # Global flag for graceful shutdown
 shutdown_requested = False
 
+# HTTP statuses worth retrying; 403 only when it signals rate limiting
+RETRY_STATUSES = (403, 429, 500, 502, 503, 504)
+
+def _is_transient(error):
+    """Check whether a Drive API error is likely to succeed on retry"""
+    status = getattr(error.resp, 'status', None)
+    if status not in RETRY_STATUSES:
+        return False
+    if status == 403:
+        # Other 403s (e.g. missing permissions) will not go away by retrying
+        return b'ratelimitexceeded' in (error.content or b'').lower()
+    return True
+
+def _retry(tries=5, base=1.0, cap=30.0, on=(HttpError,)):
+    """
+    Retry the decorated function on transient Drive API errors
+    
+    Waits with exponential backoff plus random jitter between attempts.
+    
+    Args:
+        tries: Maximum number of attempts
+        base: Delay before the first retry, in seconds
+        cap: Upper bound on the backoff delay, in seconds
+        on: Exception types that may be retried
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            for attempt in range(tries):
+                try:
+                    return func(*args, **kwargs)
+                except on as error:
+                    if attempt == tries - 1 or not _is_transient(error):
+                        raise
+                    
+                    delay = min(cap, base * 2 ** attempt) + random.uniform(0, base)
+                    print(f'  Transient error ({error.resp.status}), retrying in {delay:.1f}s...')
+                    time.sleep(delay)
+        return wrapper
+    return decorator
+
+def _escape_query_value(value):
+    """Escape a string for use inside a quoted Drive query value"""
+    return value.replace('\\', '\\\\').replace("'", "\\'")
+
+@functools.lru_cache(maxsize=4096)
+def _build_query(name=None, folder_id=None, mime_type=None):
+    """
+    Build a files().list query for non-trashed files
+    
+    Args:
+        name: Optional exact file name to match
+        folder_id: Optional ID of the parent folder
+        mime_type: Optional MIME type to match
+    
+    Returns:
+        str: Drive query string
+    """
+    clauses = []
+    if name is not None:
+        clauses.append(f"name='{_escape_query_value(name)}'")
+    if mime_type:
+        clauses.append(f"mimeType='{_escape_query_value(mime_type)}'")
+    clauses.append('trashed=false')
+    if folder_id:
+        clauses.append(f"'{_escape_query_value(folder_id)}' in parents")
+    return ' and '.join(clauses)
+
 def signal_handler(signum, frame):
     """Handle shutdown signals gracefully"""
     global shutdown_requested
     print('\n\nShutdown signal received. Finishing current operation...')
     shutdown_requested = True
 
+class Fingerprinter:
+    """
+    Incremental form of DriveUploader._calculate_local_fingerprint
+    
+    Gives the same fingerprint from the file's bytes fed in order, so it can
+    share a read of the file with the MD5 calculation.
+    """
+    
+    def __init__(self, size):
+        self._segmented = blake3 is None and size > FINGERPRINT_SEGMENT_SIZE
+        self._segment_digests = []
+        self._segment_left = FINGERPRINT_SEGMENT_SIZE
+        
+        if blake3 is not None:
+            self._prefix = 'blake3:'
+            self._hasher = blake3.blake3(max_threads=blake3.blake3.AUTO)
+        else:
+            self._prefix = 'blake2b-tree:' if self._segmented else 'blake2b:'
+            self._hasher = hashlib.blake2b()
+    
+    def update(self, data):
+        if not self._segmented:
+            self._hasher.update(data)
+            return
+        
+        # Split the data at segment boundaries, one BLAKE2b per segment
+        view = memoryview(data).cast('B')
+        while len(view):
+            n = min(len(view), self._segment_left)
+            self._hasher.update(view[:n])
+            view = view[n:]
+            self._segment_left -= n
+            
+            if self._segment_left == 0:
+                self._segment_digests.append(self._hasher.digest())
+                self._hasher = hashlib.blake2b()
+                self._segment_left = FINGERPRINT_SEGMENT_SIZE
+    
+    def hexdigest(self):
+        if not self._segmented:
+            return self._prefix + self._hasher.hexdigest()
+        
+        digests = list(self._segment_digests)
+        if self._segment_left < FINGERPRINT_SEGMENT_SIZE:
+            digests.append(self._hasher.digest())
+        return self._prefix + hashlib.blake2b(b''.join(digests)).hexdigest()
+
+class HashingReader(io.RawIOBase):
+    """
+    Read-only file wrapper that hashes the data read through it
+    
+    Computes both the MD5 and the local fingerprint. Each byte is hashed the
+    first time it is read in order, so re-reading after seeking back (e.g. a
+    retried upload chunk) does not hash it twice.
+    """
+    
+    def __init__(self, file, size):
+        self._file = file
+        self._size = size
+        self._md5 = hashlib.md5()
+        self._fingerprint = Fingerprinter(size)
+        self._hashed = 0
+    
+    def readable(self):
+        return True
+    
+    def seekable(self):
+        return True
+    
+    def seek(self, offset, whence=io.SEEK_SET):
+        return self._file.seek(offset, whence)
+    
+    def tell(self):
+        return self._file.tell()
+    
+    def readinto(self, buffer):
+        start = self._file.tell()
+        n = self._file.readinto(buffer)
+        
+        if n and start <= self._hashed < start + n:
+            with memoryview(buffer) as view:
+                new_data = view.cast('B')[self._hashed - start:n]
+                self._md5.update(new_data)
+                self._fingerprint.update(new_data)
+            self._hashed = start + n
+        
+        return n
+    
+    def hexdigests(self):
+        """
+        Return the hashes of the whole file
+        
+        Returns:
+            tuple: (md5, fingerprint), or (None, None) if not every byte was read
+        """
+        if self._hashed != self._size:
+            return None, None
+        return self._md5.hexdigest(), self._fingerprint.hexdigest()
+
+class TokenBucket:
+    """Thread-safe token bucket used to cap the rate of API requests"""
+    
+    def __init__(self, rate, burst):
+        if rate <= 0:
+            raise ValueError(f'Request rate must be positive, got {rate}')
+        self.rate = rate
+        self.burst = burst
+        self._tokens = burst
+        self._last = time.monotonic()
+        self._lock = threading.Lock()
+    
+    def acquire(self, tokens=1):
+        """
+        Block until tokens are available, then consume them
+        
+        A request for more tokens than the burst waits for a full bucket and
+        leaves it in debt, so later callers make up the difference.
+        """
+        needed = min(tokens, self.burst)
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.burst, self._tokens + (now - self._last) * self.rate)
+                self._last = now
+                
+                if self._tokens >= needed:
+                    self._tokens -= tokens
+                    return
+                
+                wait = (needed - self._tokens) / self.rate
+            
+            time.sleep(wait)
+
 class DriveUploader:
-    def __init__(self, credentials_file='credentials.json', token_file='token.pickle'):
+    def __init__(self, credentials_file='credentials.json', token_file='token.pickle', requests_per_second=DEFAULT_REQUESTS_PER_SECOND):
         self.credentials_file = credentials_file
         self.token_file = token_file
         self.service = None
+        self._creds = None
+        # Latest known hashes per local path: {path: (mtime_ns, size, md5, fingerprint)}
+        self._md5_cache = {}
+        # Stat results gathered while scanning the upload directory
+        self._scan_stats = {}
+        # Prefetched file_exists listings, keyed by (folder_id, filename)
+        self._exists_cache = {}
+        # Full listings of Drive folders: {folder_id: {name: [file, ...]}}
+        self._folder_index = {}
+        # googleapiclient services are not thread-safe, so each worker builds its own
+        self._local = threading.local()
+        # Shared by all threads so bursts never exceed Drive's per-user rate limit
+        self._limiter = TokenBucket(rate=requests_per_second, burst=max(1, requests_per_second))
+        # Files known to be on Drive from earlier runs, keyed by absolute local path
+        self._state = shelve.open(self.token_file + '.state')
+        self._state_lock = threading.Lock()
         self._authenticate()
     
+    def close(self):
+        """Flush and close the persistent upload state"""
+        with self._state_lock:
+            self._state.close()
+    
     def _authenticate(self):
         """Handle authentication with headless-friendly options"""
         import json
@@ -106,15 +374,364 @@ class DriveUploader:
             with open(self.token_file, 'wb') as token:
                 pickle.dump(creds, token)
         
-        self.service = build('drive', 'v3', credentials=creds)
+        self._creds = creds
+        self.service = self._build_service()
+        self._local.service = self.service
+    
+    def _build_service(self):
+        """Build a Drive service with its own keep-alive HTTP connection"""
+        http = AuthorizedHttp(self._creds, http=build_http())
+        # Use the discovery document bundled with the client instead of fetching it
+        return build('drive', 'v3', http=http, static_discovery=True, cache_discovery=False)
     
-    def _calculate_md5(self, file_path):
-        """Calculate MD5 checksum of a file"""
+    @_retry()
+    def _execute(self, request, tokens=1):
+        """
+        Execute a Drive API request, rate limited and retrying transient errors
+        
+        Args:
+            request: Request or batch to execute
+            tokens: Number of requests Drive counts for it, e.g. the size of a batch
+        """
+        if getattr(request, 'resumable', None) is None:
+            self._limiter.acquire(tokens)
+            return request.execute()
+        
+        # Resumable uploads send one HTTP request per chunk, so limit each chunk
+        response = None
+        while response is None:
+            self._limiter.acquire()
+            _, response = request.next_chunk()
+        return response
+    
+    def _get_service(self):
+        """Return the Drive service for the calling thread"""
+        # Each thread keeps its service, and so its open connection, for reuse
+        service = getattr(self._local, 'service', None)
+        if service is None:
+            service = self._build_service()
+            self._local.service = service
+        return service
+    
+    def _stat(self, file_path):
+        """Return the stat of a file, reusing the result from the directory scan"""
+        stat = self._scan_stats.get(str(file_path))
+        if stat is None:
+            stat = os.stat(file_path)
+        return stat
+    
+    def _scan_directory(self, directory, pattern='*', recursive=True):
+        """
+        Find files whose names match a pattern
+        
+        Uses os.scandir so directory entries are classified without an
+        extra stat call each.
+        
+        Args:
+            directory: Path to local directory
+            pattern: File name pattern to match
+            recursive: If True, also scan subdirectories
+        
+        Returns:
+            dict: File path to its os.stat_result
+        """
+        found = {}
+        pending = [directory]
+        
+        # Paths that cannot be read, or that vanish or change type mid-scan, are skipped
+        while pending:
+            try:
+                entries = os.scandir(pending.pop())
+            except OSError:
+                continue
+            with entries:
+                for entry in entries:
+                    if entry.is_dir(follow_symlinks=False):
+                        if recursive:
+                            pending.append(entry.path)
+                    elif entry.is_file() and fnmatch.fnmatch(entry.name, pattern):
+                        try:
+                            found[str(Path(entry.path))] = entry.stat()
+                        except OSError:
+                            continue
+        
+        return found
+    
+    def _calculate_local_fingerprint(self, file_path):
+        """
+        Fingerprint a file's contents for the local upload state
+        
+        Uses BLAKE3 if installed, otherwise BLAKE2b. The algorithm name is
+        included so fingerprints from different algorithms never compare equal.
+        """
+        if blake3 is not None:
+            hasher = blake3.blake3(max_threads=blake3.blake3.AUTO)
+            if self._can_mmap(file_path):
+                hasher.update_mmap(file_path)
+            else:
+                with open(file_path, 'rb', buffering=0) as f:
+                    while chunk := f.read(HASH_CHUNK_SIZE):
+                        hasher.update(chunk)
+            return 'blake3:' + hasher.hexdigest()
+        
+        size = self._stat(file_path).st_size
+        if size > FINGERPRINT_SEGMENT_SIZE:
+            return 'blake2b-tree:' + self._fingerprint_segments(file_path, size)
+        
+        with open(file_path, 'rb', buffering=0) as f:
+            return 'blake2b:' + hashlib.file_digest(f, 'blake2b').hexdigest()
+    
+    def _fingerprint_segments(self, file_path, size):
+        """
+        Hash a large file as independent segments on all cores
+        
+        Each FINGERPRINT_SEGMENT_SIZE segment is hashed with BLAKE2b in its
+        own thread, and the ordered segment digests are hashed again to give
+        the result. This is not a plain BLAKE2b of the file, but it is stable
+        for identical contents.
+        
+        Returns:
+            str: Hex digest
+        """
+        def hash_segment(offset):
+            hasher = hashlib.blake2b()
+            buf = bytearray(HASH_CHUNK_SIZE)
+            view = memoryview(buf)
+            remaining = min(FINGERPRINT_SEGMENT_SIZE, size - offset)
+            
+            with open(file_path, 'rb', buffering=0) as f:
+                f.seek(offset)
+                while remaining > 0:
+                    n = f.readinto(view[:min(HASH_CHUNK_SIZE, remaining)])
+                    if not n:
+                        break
+                    hasher.update(view[:n])
+                    remaining -= n
+            
+            return hasher.digest()
+        
+        with ThreadPoolExecutor(max_workers=os.cpu_count()) as executor:
+            digests = executor.map(hash_segment, range(0, size, FINGERPRINT_SEGMENT_SIZE))
+            return hashlib.blake2b(b''.join(digests)).hexdigest()
+    
+    def _cache_hashes(self, file_path, md5, fingerprint=None):
+        """Remember the hashes of a file's current contents, replacing any older entry"""
+        stat = self._stat(file_path)
+        self._md5_cache[str(file_path)] = (stat.st_mtime_ns, stat.st_size, md5, fingerprint)
+    
+    def _cached_hashes(self, file_path):
+        """Return the cached (md5, fingerprint) of a file if it is unchanged, else None"""
+        stat = self._stat(file_path)
+        cached = self._md5_cache.get(str(file_path))
+        if cached is not None and cached[:2] == (stat.st_mtime_ns, stat.st_size):
+            return cached[2:]
+        return None
+    
+    def _calculate_md5_for_drive(self, file_path):
+        """Calculate MD5 checksum of a file, reusing cached results for unchanged files"""
+        cached = self._cached_hashes(file_path)
+        if cached is not None:
+            return cached[0]
+        
+        md5, fingerprint = self._hash_file(file_path)
+        self._cache_hashes(file_path, md5, fingerprint)
+        return md5
+    
+    def _can_mmap(self, file_path):
+        """
+        Check whether a file is safe to memory-map for hashing
+        
+        A file still being written to (e.g. in a watched directory) could be
+        truncated while mapped, so it must be unchanged since the directory
+        scan and not modified within MMAP_SETTLE_TIME.
+        """
+        try:
+            stat = os.stat(file_path)
+        except OSError:
+            return False
+        scanned = self._stat(file_path)
+        return (stat.st_size == scanned.st_size
+                and stat.st_mtime_ns == scanned.st_mtime_ns
+                and time.time() - stat.st_mtime > MMAP_SETTLE_TIME)
+    
+    def _hash_file(self, file_path):
+        """
+        Hash the full contents of a file in a single read
+        
+        Returns:
+            tuple: (md5: str, fingerprint: str) - the fingerprint as given
+                by _calculate_local_fingerprint
+        """
+        size = os.path.getsize(file_path)
+        
+        # Hash large files straight from the page cache, avoiding a copy per read
+        if size > MMAP_THRESHOLD and self._can_mmap(file_path):
+            try:
+                with open(file_path, 'rb') as f, mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+                    if hasattr(mmap, 'MADV_SEQUENTIAL'):
+                        mm.madvise(mmap.MADV_SEQUENTIAL)
+                    fingerprint = Fingerprinter(size)
+                    fingerprint.update(mm)
+                    return hashlib.md5(mm).hexdigest(), fingerprint.hexdigest()
+            except (OSError, ValueError):
+                # Some filesystems cannot be mapped - fall back to reading
+                pass
+        
+        # Reuse a single buffer rather than allocating bytes per read
         hash_md5 = hashlib.md5()
-        with open(file_path, 'rb') as f:
-            for chunk in iter(lambda: f.read(4096), b''):
-                hash_md5.update(chunk)
-        return hash_md5.hexdigest()
+        fingerprint = Fingerprinter(size)
+        buf = bytearray(HASH_CHUNK_SIZE)
+        view = memoryview(buf)
+        with open(file_path, 'rb', buffering=0) as f:
+            while n := f.readinto(buf):
+                hash_md5.update(view[:n])
+                fingerprint.update(view[:n])
+        return hash_md5.hexdigest(), fingerprint.hexdigest()
+    
+    def _state_lookup(self, file_path, folder_id=None):
+        """
+        Look up a local file in the persistent upload state
+        
+        Args:
+            file_path: Path to the local file
+            folder_id: Drive folder ID the file is uploaded into
+        
+        Returns:
+            str or None: Drive file ID if the file is unchanged since it was last synced
+        """
+        key = os.path.abspath(file_path)
+        stat = self._stat(file_path)
+        
+        with self._state_lock:
+            entry = self._state.get(key)
+        
+        if entry is None:
+            return None
+        
+        if entry['size'] == stat.st_size and entry['folder_id'] == folder_id:
+            if entry['mtime_ns'] == stat.st_mtime_ns:
+                return entry['file_id']
+            
+            # Only the timestamp changed - check whether the contents did too
+            if entry.get('fingerprint') == self._calculate_local_fingerprint(file_path):
+                entry['mtime_ns'] = stat.st_mtime_ns
+                with self._state_lock:
+                    self._state[key] = entry
+                return entry['file_id']
+        
+        # File changed locally or moved target - forget the stale entry
+        with self._state_lock:
+            self._state.pop(key, None)
+        return None
+    
+    def _state_record(self, file_path, folder_id, file_id, md5, fingerprint=None):
+        """Remember that a local file is synced to a Drive file"""
+        stat = self._stat(file_path)
+        
+        # Prefer a fingerprint taken while the file was read for its MD5
+        if fingerprint is None:
+            cached = self._cached_hashes(file_path)
+            fingerprint = cached[1] if cached is not None else None
+        if fingerprint is None:
+            fingerprint = self._calculate_local_fingerprint(file_path)
+        
+        with self._state_lock:
+            self._state[os.path.abspath(file_path)] = {
+                'mtime_ns': stat.st_mtime_ns,
+                'size': stat.st_size,
+                'folder_id': folder_id,
+                'file_id': file_id,
+                'md5': md5,
+                'fingerprint': fingerprint
+            }
+    
+    def _index_folder(self, folder_id):
+        """
+        List a Drive folder once and index its contents by name
+        
+        Args:
+            folder_id: ID of the folder to list
+        """
+        index = {}
+        page_token = None
+        
+        try:
+            while True:
+                response = self._execute(self._get_service().files().list(
+                    q=_build_query(folder_id=folder_id),
+                    spaces='drive',
+                    fields='nextPageToken, files(id, name, md5Checksum, size)',
+                    pageSize=LIST_PAGE_SIZE,
+                    pageToken=page_token
+                ))
+                
+                for file in response.get('files', []):
+                    index.setdefault(file.get('name'), []).append(file)
+                
+                page_token = response.get('nextPageToken')
+                if not page_token:
+                    break
+        except HttpError as error:
+            # Leave the folder unindexed so lookups fall back to per-file queries
+            print(f'Error listing folder {folder_id}: {error}')
+            return
+        
+        self._folder_index[folder_id] = index
+    
+    def _record_upload(self, folder_id, file):
+        """Reflect an uploaded or updated file in the folder index"""
+        if folder_id not in self._folder_index:
+            return
+        
+        siblings = self._folder_index[folder_id].setdefault(file.get('name'), [])
+        siblings[:] = [f for f in siblings if f.get('id') != file.get('id')]
+        siblings.insert(0, file)
+    
+    def _prefetch_existing(self, uploads):
+        """
+        Look up existing Drive files for many uploads using batch requests
+        
+        Uploads into indexed folders are skipped, as their lookups are
+        already served from the folder index.
+        
+        Args:
+            uploads: List of (local path, folder ID) pairs
+        """
+        self._exists_cache = {}
+        keys = list(dict.fromkeys(
+            (folder_id, os.path.basename(path))
+            for path, folder_id in uploads
+            if folder_id not in self._folder_index
+        ))
+        
+        def handle_response(request_id, response, exception):
+            # Failed lookups are left uncached so file_exists queries them directly
+            if exception is None:
+                self._exists_cache[keys[int(request_id)]] = response.get('files', [])
+        
+        service = self._get_service()
+        for start in range(0, len(keys), BATCH_SIZE):
+            batch = service.new_batch_http_request(callback=handle_response)
+            end = min(start + BATCH_SIZE, len(keys))
+            
+            for i in range(start, end):
+                folder_id, filename = keys[i]
+                
+                batch.add(
+                    service.files().list(
+                        q=_build_query(filename, folder_id),
+                        spaces='drive',
+                        fields='files(id, name, md5Checksum, size)',
+                        pageSize=10
+                    ),
+                    request_id=str(i)
+                )
+            
+            try:
+                # Drive counts every request in a batch against the rate limit
+                self._execute(batch, tokens=end - start)
+            except HttpError as error:
+                print(f'Error prefetching existing files: {error}')
     
     def create_or_get_folder(self, folder_name, parent_id=None):
         """
@@ -129,16 +746,12 @@ class DriveUploader:
         """
         try:
             # Check if folder already exists
-            query = f"name='{folder_name}' and mimeType='application/vnd.google-apps.folder' and trashed=false"
-            if parent_id:
-                query += f" and '{parent_id}' in parents"
-            
-            response = self.service.files().list(
-                q=query,
+            response = self._execute(self._get_service().files().list(
+                q=_build_query(folder_name, parent_id, FOLDER_MIME_TYPE),
                 spaces='drive',
                 fields='files(id, name)',
                 pageSize=1
-            ).execute()
+            ))
             
             files = response.get('files', [])
             
@@ -146,28 +759,127 @@ class DriveUploader:
                 print(f'  Found existing folder: {folder_name} (ID: {files[0].get("id")})')
                 return files[0].get('id')
             
-            # Create new folder
-            file_metadata = {
-                'name': folder_name,
-                'mimeType': 'application/vnd.google-apps.folder'
-            }
-            
-            if parent_id:
-                file_metadata['parents'] = [parent_id]
-            
-            folder = self.service.files().create(
-                body=file_metadata,
-                fields='id, name'
-            ).execute()
-            
-            print(f'  Created folder: {folder.get("name")} (ID: {folder.get("id")})')
-            return folder.get('id')
+            return self._create_folder(folder_name, parent_id)
             
         except HttpError as error:
             print(f'Error creating/getting folder: {error}')
             return None
     
-    def file_exists(self, filename, folder_id=None, check_md5=True, local_file_path=None):
+    def _create_folder(self, folder_name, parent_id=None):
+        """Create a new folder in Google Drive and return its ID"""
+        file_metadata = {
+            'name': folder_name,
+            'mimeType': FOLDER_MIME_TYPE
+        }
+        
+        if parent_id:
+            file_metadata['parents'] = [parent_id]
+        
+        folder = self._execute(self._get_service().files().create(
+            body=file_metadata,
+            fields='id, name'
+        ))
+        
+        print(f'  Created folder: {folder.get("name")} (ID: {folder.get("id")})')
+        return folder.get('id')
+    
+    def _list_subfolders(self, parent_id):
+        """
+        List the folders directly inside a Drive folder
+        
+        Args:
+            parent_id: ID of the folder to list
+        
+        Returns:
+            dict: Folder name to folder ID
+        """
+        subfolders = {}
+        page_token = None
+        
+        while True:
+            response = self._execute(self._get_service().files().list(
+                q=_build_query(folder_id=parent_id, mime_type=FOLDER_MIME_TYPE),
+                spaces='drive',
+                fields='nextPageToken, files(id, name)',
+                pageSize=LIST_PAGE_SIZE,
+                pageToken=page_token
+            ))
+            
+            for folder in response.get('files', []):
+                subfolders.setdefault(folder.get('name'), folder.get('id'))
+            
+            page_token = response.get('nextPageToken')
+            if not page_token:
+                return subfolders
+    
+    def _create_folder_tree(self, relative_dirs, folder_id=None):
+        """
+        Create or find the Drive folders mirroring a set of local directories
+        
+        Parents are resolved before their children, and each parent's
+        subfolders are listed with a single query.
+        
+        Args:
+            relative_dirs: Iterable of directory paths relative to the upload root
+            folder_id: Optional Drive folder ID corresponding to the upload root
+        
+        Returns:
+            tuple: (dict of relative directory path to Drive folder ID,
+                    set of the IDs of folders created by this call)
+        """
+        # Include every ancestor so each folder's parent is resolved first
+        needed = set()
+        for relative_dir in relative_dirs:
+            needed.add(relative_dir)
+            needed.update(relative_dir.parents)
+        
+        folder_ids = {Path('.'): folder_id}
+        subfolders = {}
+        created = set()
+        
+        for relative_dir in sorted(needed, key=lambda p: len(p.parts)):
+            if relative_dir in folder_ids:
+                continue
+            
+            parent_id = folder_ids[relative_dir.parent]
+            folder_name = relative_dir.name
+            
+            # Without a parent ID there is no single folder to list
+            if not parent_id:
+                folder_ids[relative_dir] = self.create_or_get_folder(folder_name, parent_id)
+                continue
+            
+            try:
+                if parent_id not in subfolders:
+                    subfolders[parent_id] = self._list_subfolders(parent_id)
+                
+                if folder_name in subfolders[parent_id]:
+                    folder_ids[relative_dir] = subfolders[parent_id][folder_name]
+                    print(f'  Found existing folder: {folder_name} (ID: {folder_ids[relative_dir]})')
+                else:
+                    folder_ids[relative_dir] = self._create_folder(folder_name, parent_id)
+                    created.add(folder_ids[relative_dir])
+                    # A folder created just now has no subfolders to list
+                    subfolders[folder_ids[relative_dir]] = {}
+                    
+            except HttpError as error:
+                print(f'Error creating/getting folder: {error}')
+                folder_ids[relative_dir] = None
+        
+        return folder_ids, created
+    
+    def _cached_listing(self, filename, folder_id=None):
+        """
+        Return prefetched Drive files matching a name, if the lookup is cached
+        
+        Returns:
+            list or None: Matching files, or None if nothing is cached
+        """
+        if folder_id in self._folder_index:
+            return self._folder_index[folder_id].get(filename, [])
+        return self._exists_cache.get((folder_id, filename))
+    
+    def file_exists(self, filename, folder_id=None, check_md5=True, local_file_path=None, local_md5=None):
         """
         Check if file already exists in Google Drive
         
@@ -176,37 +888,48 @@ class DriveUploader:
             folder_id: Optional folder ID to search within
             check_md5: If True, also compare MD5 checksums for exact match
             local_file_path: Path to local file for MD5 comparison
+            local_md5: Optional precomputed MD5 of the local file
         
         Returns:
             tuple: (exists: bool, file_id: str or None)
         """
         try:
-            # Build query
-            query = f"name='{filename}' and trashed=false"
-            if folder_id:
-                query += f" and '{folder_id}' in parents"
-            
-            # Search for files
-            response = self.service.files().list(
-                q=query,
-                spaces='drive',
-                fields='files(id, name, md5Checksum, size)',
-                pageSize=10
-            ).execute()
+            # Unchanged files synced on an earlier run need no lookup at all
+            if local_file_path:
+                file_id = self._state_lookup(local_file_path, folder_id)
+                if file_id:
+                    return True, file_id
             
-            files = response.get('files', [])
+            files = self._cached_listing(filename, folder_id)
+            
+            if files is None:
+                # Search for files
+                response = self._execute(self._get_service().files().list(
+                    q=_build_query(filename, folder_id),
+                    spaces='drive',
+                    fields='files(id, name, md5Checksum, size)',
+                    pageSize=10
+                ))
+                
+                files = response.get('files', [])
             
             if not files:
                 return False, None
             
             # If MD5 check is enabled and we have a local file
             if check_md5 and local_file_path:
-                local_md5 = self._calculate_md5(local_file_path)
+                # Only files of the same size can match, so avoid hashing otherwise
+                local_size = self._stat(local_file_path).st_size
+                candidates = [f for f in files if int(f.get('size', -1)) == local_size]
                 
-                for file in files:
+                if candidates and local_md5 is None:
+                    local_md5 = self._calculate_md5_for_drive(local_file_path)
+                
+                for file in candidates:
                     # Google Drive returns MD5 for most files
                     drive_md5 = file.get('md5Checksum')
                     if drive_md5 and drive_md5 == local_md5:
+                        self._state_record(local_file_path, folder_id, file.get('id'), drive_md5)
                         return True, file.get('id')
                 
                 # Files with same name exist but MD5 doesn't match - return file_id to update
@@ -219,7 +942,7 @@ class DriveUploader:
             print(f'Error checking file existence: {error}')
             return False, None
     
-    def upload_file(self, file_path, folder_id=None, mime_type=None, force=False, check_md5=True):
+    def upload_file(self, file_path, folder_id=None, mime_type=None, force=False, check_md5=True, local_md5=None):
         """
         Upload a single file to Google Drive
         
@@ -229,53 +952,95 @@ class DriveUploader:
             mime_type: Optional MIME type
             force: If True, upload even if file exists
             check_md5: If True, compare MD5 checksums for duplicate detection
+            local_md5: Optional precomputed MD5 of the local file
         
         Returns:
-            str: File ID if uploaded, None otherwise
+            tuple: (file_id: str or None, status: str)
+                status is 'uploaded', 'updated', 'skipped' or 'failed'
         """
         filename = os.path.basename(file_path)
         
         # Check if file already exists
         if not force:
-            exists, file_id = self.file_exists(filename, folder_id, check_md5, file_path)
+            exists, file_id = self.file_exists(filename, folder_id, check_md5, file_path, local_md5)
             if exists:
                 print(f'Skipped: {filename} (already exists, ID: {file_id})')
-                return file_id
+                return file_id, 'skipped'
         else:
-            # Force mode: check if file exists to update instead of duplicate
-            exists, file_id = self.file_exists(filename, folder_id, check_md5=False, local_file_path=None)
+            # Force mode: check if file exists to update instead of duplicate,
+            # answering from the prefetched listings when possible
+            existing = self._cached_listing(filename, folder_id)
+            if existing is not None:
+                file_id = existing[0].get('id') if existing else None
+            else:
+                exists, file_id = self.file_exists(filename, folder_id, check_md5=False, local_file_path=None)
+        
+        if mime_type is None:
+            mime_type = mimetypes.guess_type(file_path)[0] or 'application/octet-stream'
         
         try:
-            media = MediaFileUpload(file_path, mimetype=mime_type, resumable=True)
-            
-            # Update existing file if file_id is provided, otherwise create new
-            if file_id:
-                file = self.service.files().update(
-                    fileId=file_id,
-                    media_body=media,
-                    fields='id, name, md5Checksum'
-                ).execute()
-                print(f'Updated: {file.get("name")} (ID: {file.get("id")})')
-            else:
-                file_metadata = {'name': filename}
+            size = os.path.getsize(file_path)
+            
+            # Hash the file while it is read for upload instead of in a separate pass
+            with open(file_path, 'rb') as f:
+                stream = HashingReader(f, size)
                 
-                if folder_id:
-                    file_metadata['parents'] = [folder_id]
+                # Small files go up in one request; resumable sessions cost an extra round-trip
+                media = MediaIoBaseUpload(
+                    stream,
+                    mimetype=mime_type,
+                    chunksize=UPLOAD_CHUNK_SIZE,
+                    resumable=size > RESUMABLE_THRESHOLD
+                )
                 
-                file = self.service.files().create(
-                    body=file_metadata,
-                    media_body=media,
-                    fields='id, name, md5Checksum'
-                ).execute()
-                print(f'Uploaded: {file.get("name")} (ID: {file.get("id")})')
+                # Update existing file if file_id is provided, otherwise create new
+                if file_id:
+                    file = self._execute(self._get_service().files().update(
+                        fileId=file_id,
+                        media_body=media,
+                        fields='id, name, md5Checksum, size'
+                    ))
+                    print(f'Updated: {file.get("name")} (ID: {file.get("id")})')
+                    status = 'updated'
+                else:
+                    file_metadata = {'name': filename}
+                    
+                    if folder_id:
+                        file_metadata['parents'] = [folder_id]
+                    
+                    file = self._execute(self._get_service().files().create(
+                        body=file_metadata,
+                        media_body=media,
+                        fields='id, name, md5Checksum, size'
+                    ))
+                    print(f'Uploaded: {file.get("name")} (ID: {file.get("id")})')
+                    status = 'uploaded'
             
-            return file.get('id')
+            # The prefetched listings no longer reflect this file
+            self._exists_cache.pop((folder_id, filename), None)
+            self._record_upload(folder_id, file)
+            
+            uploaded_md5, fingerprint = stream.hexdigests()
+            drive_md5 = file.get('md5Checksum')
+            
+            if uploaded_md5 and drive_md5 and uploaded_md5 != drive_md5:
+                # Leave it out of the upload state so the next run retries it
+                print(f'Checksum mismatch after uploading {filename}: '
+                      f'local {uploaded_md5}, Drive {drive_md5}')
+                return file.get('id'), 'failed'
+            
+            if uploaded_md5:
+                self._cache_hashes(file_path, uploaded_md5, fingerprint)
+            
+            self._state_record(file_path, folder_id, file.get('id'), drive_md5 or uploaded_md5, fingerprint)
+            
+            return file.get('id'), status
             
         except HttpError as error:
             print(f'An error occurred: {error}')
-            return None
+            return None, 'failed'
     
-    def upload_directory(self, directory_path, folder_id=None, pattern='*', force=False, check_md5=True, recursive=True):
+    def upload_directory(self, directory_path, folder_id=None, pattern='*', force=False, check_md5=True, recursive=True, max_workers=4):
         """
         Upload all files matching pattern from directory
         
@@ -286,6 +1051,7 @@ class DriveUploader:
             force: If True, upload even if files exist
             check_md5: If True, compare MD5 checksums
             recursive: If True, upload subdirectories recursively (default: True)
+            max_workers: Number of files to upload concurrently (default: 4)
         """
         directory = Path(directory_path)
         
@@ -293,72 +1059,105 @@ class DriveUploader:
             print(f'Directory {directory_path} does not exist')
             return
         
-        # Use rglob for recursive, glob for non-recursive
-        if recursive:
-            files = list(directory.rglob(pattern))
-        else:
-            files = list(directory.glob(pattern))
-        
-        # Filter to only files (not directories)
-        files = [f for f in files if f.is_file()]
+        self._scan_stats = self._scan_directory(directory, pattern, recursive)
         
-        print(f'Found {len(files)} files to process{" (recursive)" if recursive else ""}')
-        
-        uploaded = 0
-        skipped = 0
-        
-        # Cache for folder IDs to avoid recreating
-        folder_cache = {}
-        
-        for file_path in files:
-            # Determine the target folder ID based on relative path
-            relative_path = file_path.relative_to(directory)
-            target_folder_id = folder_id
+        try:
+            files = [Path(f) for f in self._scan_stats]
+            
+            print(f'Found {len(files)} files to process{" (recursive)" if recursive else ""}')
+            
+            # Number of files per upload_file status
+            counts = dict.fromkeys(('uploaded', 'updated', 'skipped', 'failed'), 0)
+            
+            # Create the whole folder structure before uploading anything
+            folder_cache, created_folders = self._create_folder_tree(
+                {f.relative_to(directory).parent for f in files},
+                folder_id
+            )
+            
+            # (local path, target folder ID) pairs to upload
+            uploads = [
+                (str(f), folder_cache[f.relative_to(directory).parent])
+                for f in files
+            ]
+            
+            # Files unchanged since an earlier run are known to exist already
+            if force:
+                pending = uploads
+            else:
+                pending = [(path, f) for path, f in uploads if not self._state_lookup(path, f)]
             
-            # If file is in a subdirectory, create/get the folder structure
-            if len(relative_path.parts) > 1:
-                # Need to create folder structure
-                current_folder_id = folder_id
-                folder_parts = relative_path.parts[:-1]  # Exclude filename
+            # Resolve which files already exist in as few round-trips as possible:
+            # list each target folder once, and batch lookups for the rest.
+            # Folders created above are known to be empty.
+            self._folder_index = {created_id: {} for created_id in created_folders}
+            for target_folder_id in dict.fromkeys(f for _, f in pending):
+                if target_folder_id and target_folder_id not in self._folder_index:
+                    self._index_folder(target_folder_id)
+            self._prefetch_existing(pending)
+            
+            # Files that need an MD5 for duplicate detection, skipping any whose
+            # size already rules out a match
+            to_hash = set()
+            if check_md5 and not force:
+                for path, target_folder_id in pending:
+                    existing = self._cached_listing(os.path.basename(path), target_folder_id)
+                    local_size = self._stat(path).st_size
+                    if existing is None or any(int(f.get('size', -1)) == local_size for f in existing):
+                        to_hash.add(path)
+            
+            # Hash and upload concurrently: each file is handed to the uploaders as
+            # soon as its hash is ready, so hashing overlaps with network transfer.
+            # hashlib releases the GIL while hashing, so hasher threads scale across cores.
+            with ThreadPoolExecutor(max_workers=os.cpu_count()) as hashers, \
+                    ThreadPoolExecutor(max_workers=max_workers) as uploaders:
                 
-                for i, folder_name in enumerate(folder_parts):
-                    # Build cache key from the path up to this point
-                    cache_key = '/'.join(folder_parts[:i+1])
-                    
-                    if cache_key in folder_cache:
-                        current_folder_id = folder_cache[cache_key]
-                    else:
-                        current_folder_id = self.create_or_get_folder(
-                            folder_name,
-                            current_folder_id
-                        )
-                        folder_cache[cache_key] = current_folder_id
+                def submit_upload(path, target_folder_id):
+                    # Each upload is skipped if the file already exists
+                    return uploaders.submit(
+                        self.upload_file,
+                        path,
+                        target_folder_id,
+                        force=force,
+                        check_md5=check_md5
+                    )
                 
-                target_folder_id = current_folder_id
-            
-            # Check if file exists
-            exists_before, _ = self.file_exists(
-                file_path.name, 
-                target_folder_id, 
-                check_md5, 
-                str(file_path)
-            )
+                hash_futures = {
+                    hashers.submit(self._calculate_md5_for_drive, path): (path, target_folder_id)
+                    for path, target_folder_id in uploads
+                    if path in to_hash
+                }
+                upload_futures = {
+                    submit_upload(path, target_folder_id): path
+                    for path, target_folder_id in uploads
+                    if path not in to_hash
+                }
+                
+                # A failed hash is not fatal: upload_file hashes the file again
+                for future in as_completed(hash_futures):
+                    path, target_folder_id = hash_futures[future]
+                    upload_futures[submit_upload(path, target_folder_id)] = path
+                
+                # upload_file reports Drive errors itself; anything else, such as
+                # a file that became unreadable, fails only that file
+                for future in as_completed(upload_futures):
+                    try:
+                        _, status = future.result()
+                    except Exception as e:
+                        print(f'Error uploading {upload_futures[future]}: {e}')
+                        status = 'failed'
+                    counts[status] += 1
             
-            # Upload file
-            result = self.upload_file(
-                str(file_path), 
-                target_folder_id, 
-                force=force, 
-                check_md5=check_md5
-            )
+            with self._state_lock:
+                self._state.sync()
             
-            if result:
-                if not exists_before:
-                    uploaded += 1
-                else:
-                    skipped += 1
-        
-        print(f'\nSummary: {uploaded} uploaded, {skipped} skipped')
+            print(f'\nSummary: {counts["uploaded"]} uploaded, {counts["updated"]} updated, '
+                  f'{counts["skipped"]} skipped, {counts["failed"]} failed')
+        finally:
+            # Later direct calls must stat files and query Drive afresh
+            self._scan_stats = {}
+            self._folder_index = {}
+            self._exists_cache = {}
 
 
 def main():
@@ -372,6 +1171,8 @@ def main():
     RECURSIVE = os.getenv('RECURSIVE', 'true').lower() == 'true'
     DAEMON_MODE = os.getenv('DAEMON_MODE', 'false').lower() == 'true'
     CHECK_INTERVAL = int(os.getenv('CHECK_INTERVAL', '300'))  # Default: 5 minutes
+    UPLOAD_CONCURRENCY = int(os.getenv('UPLOAD_CONCURRENCY', '4'))
+    DRIVE_RPS = int(os.getenv('DRIVE_RPS', str(DEFAULT_REQUESTS_PER_SECOND)))
     TOKEN_DIR = os.getenv('TOKEN_DIR', '.')
     
     # Build full paths for credentials and token files
@@ -383,6 +1184,8 @@ def main():
     print(f'Recursive: {"yes" if RECURSIVE else "no"}')
     print(f'MD5 checking: {"enabled" if CHECK_MD5 else "disabled"}')
     print(f'Force upload: {"yes" if FORCE_UPLOAD else "no"}')
+    print(f'Concurrent uploads: {UPLOAD_CONCURRENCY}')
+    print(f'API request limit: {DRIVE_RPS} per second')
     if DRIVE_FOLDER_ID:
         print(f'Target folder ID: {DRIVE_FOLDER_ID}')
     
@@ -396,7 +1199,7 @@ def main():
     signal.signal(signal.SIGINT, signal_handler)
     signal.signal(signal.SIGTERM, signal_handler)
     
-    uploader = DriveUploader(token_file=token_file)
+    uploader = DriveUploader(token_file=token_file, requests_per_second=DRIVE_RPS)
     
     if DAEMON_MODE:
         # Daemon mode: continuously monitor and upload
@@ -415,7 +1218,8 @@ def main():
                     FILE_PATTERN, 
                     force=FORCE_UPLOAD,
                     check_md5=CHECK_MD5,
-                    recursive=RECURSIVE
+                    recursive=RECURSIVE,
+                    max_workers=UPLOAD_CONCURRENCY
                 )
             except Exception as e:
                 print(f'Error during upload: {e}')
@@ -438,8 +1242,11 @@ def main():
             FILE_PATTERN, 
             force=FORCE_UPLOAD,
             check_md5=CHECK_MD5,
-            recursive=RECURSIVE
+            recursive=RECURSIVE,
+            max_workers=UPLOAD_CONCURRENCY
         )
+    
+    uploader.close()
 
 
 if __name__ == '__main__':